@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+# ============================================================
+# CHART CONFIG
+# ============================================================
+
+CHART_CACHE_TIMEOUT = 60 * 60
+MAX_SCATTER_POINTS = 5000
+
+# orjson encodes the numpy arrays behind each trace without a per-element round trip
+pio.json.config.default_engine = "orjson"
+
+# ============================================================
+# INTERACTIVE CHARTS
+# ============================================================
+
+def _apply_dark_theme(fig):
+    fig.update_layout(
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font_color="white"
+    )
+    return fig
+
+
+def base_counts(bases):
+    # Occurrences of each base in a uint8 array of guide bytes, from a
+    # single bincount pass
+    counts = np.bincount(bases.ravel(), minlength=256)
+    return [int(counts[ord(base)]) for base in "ATGC"]
+
+
+def score_dist_figure(scores):
+    # Binned here over every candidate, so only the 20 bar heights are sent
+    counts, edges = np.histogram(scores, bins=20)
+    fig_dist = go.Figure(
+        go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)),
+        layout=dict(
+            title="AI Confidence Distribution",
+            template="plotly_dark",
+            bargap=0,
+            xaxis_title="Predicted_Efficiency",
+            yaxis_title="count"
+        )
+    )
+    return _apply_dark_theme(fig_dist)
+
+
+def gc_scatter_figure(gc, scores):
+    # A fixed-seed sample keeps the trace small and the cached JSON stable
+    if len(scores) > MAX_SCATTER_POINTS:
+        sample = np.random.default_rng(0).choice(len(scores), MAX_SCATTER_POINTS, replace=False)
+        gc, scores = gc[sample], scores[sample]
+
+    fig_scatter = go.Figure(
+        go.Scattergl(
+            x=gc,
+            y=scores,
+            mode="markers",
+            marker=dict(color=scores, colorbar=dict(title="Predicted_Efficiency"))
+        ),
+        layout=dict(
+            title="GC Content vs Efficiency",
+            template="plotly_dark",
+            xaxis_title="GC_Content",
+            yaxis_title="Predicted_Efficiency"
+        )
+    )
+    fig_scatter.add_vline(x=40, line_dash="dash", line_color="red")
+    fig_scatter.add_vline(x=60, line_dash="dash", line_color="red")
+    return _apply_dark_theme(fig_scatter)
+
+
+def composition_figure(bases):
+    fig_pie = go.Figure(
+        go.Pie(labels=["A", "T", "G", "C"], values=base_counts(bases)),
+        layout=dict(title="Nucleotide Composition", template="plotly_dark")
+    )
+    return _apply_dark_theme(fig_pie)
+
+
+# Each chart with the report columns it is drawn from, in argument order
+CHART_BUILDERS = {
+    "score_dist": (score_dist_figure, ["Predicted_Efficiency"]),
+    "gc_scatter": (gc_scatter_figure, ["GC_Content", "Predicted_Efficiency"]),
+    "composition": (composition_figure, ["seq"]),
+}
+
+# ============================================================
+# CHART CACHE
+# ============================================================
+
+def chart_key(digest, name):
+    return f"charts:{digest}:{name}"
+
+
+def _chart_json(name, columns):
+    builder, names = CHART_BUILDERS[name]
+    fig = builder(*(columns[column] for column in names))
+    # The figure was built through plotly's own constructors, no need to re-validate
+    return pio.to_json(fig, validate=False)
+
+
+def cache_charts(digest, columns):
+    # Called by the pipeline with the report's columns as arrays (rows in
+    # report order, "seq" as the guide byte matrix), so the dashboard's
+    # chart requests are normally served straight from the cache.
+    for name in CHART_BUILDERS:
+        cache.set(chart_key(digest, name), _chart_json(name, columns), CHART_CACHE_TIMEOUT)
+
+
+def report_chart(digest, report, name):
+    # Cache miss (expired, or not shared with the worker): rebuild the one
+    # chart from only the report columns it needs.
+    with default_storage.open(report, "rb") as handle:
+        df = pd.read_csv(handle, compression="gzip", usecols=CHART_BUILDERS[name][1])
+    columns = {column: df[column].to_numpy() for column in df.columns}
+    if "seq" in columns:
+        columns["seq"] = np.frombuffer("".join(df["seq"]).encode("ascii"), np.uint8)
+
+    chart = _chart_json(name, columns)
+    cache.set(chart_key(digest, name), chart, CHART_CACHE_TIMEOUT)
+    return chart
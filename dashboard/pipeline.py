@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+# ============================================================
+# PATH CONFIG
+# ============================================================
+
+# Storage prefix of the reports; see settings_prod for sharing the storage
+REPORTS_DIR = "reports"
+REPORT_TTL_SECONDS = 24 * 60 * 60
+
+# ============================================================
+# BIOLOGY HELPERS
+# ============================================================
+
+GUIDE_LEN = 20
+
+BASE_CODES = {'A': 1, 'T': 2, 'G': 3, 'C': 4}
+BASE_WEIGHTS = {'A': 313.2, 'T': 304.2, 'G': 329.2, 'C': 289.2}
+
+# Byte -> value lookup tables for the vectorised encoder
+_CODE_LUT = np.zeros(256, dtype=np.int8)
+_WEIGHT_LUT = np.zeros(256, dtype=np.float64)
+_GC_LUT = np.zeros(256, dtype=np.uint8)
+for _base, _code in BASE_CODES.items():
+    _CODE_LUT[ord(_base)] = _code
+    _WEIGHT_LUT[ord(_base)] = BASE_WEIGHTS[_base]
+_GC_LUT[[ord("G"), ord("C")]] = 1
+
+_UPPER_LUT = np.arange(256, dtype=np.uint8)
+_UPPER_LUT[ord("a"):ord("z") + 1] -= ord("a") - ord("A")
+
+# 2-bit base codes (A=00 T=11 G=01 C=10); anything else cannot be packed
+_PACK_LUT = np.full(256, 4, dtype=np.uint8)
+for _base, _bits in zip("ATGC", (0b00, 0b11, 0b01, 0b10)):
+    _PACK_LUT[ord(_base)] = _bits
+
+# Packed guides use the low 40 bits, so this never collides with one
+_UNPACKABLE = np.uint64(2 ** 64 - 1)
+
+
+def sequence_bytes(seq_bytes):
+    # Upper-cased sequence as a uint8 array, taken straight from the
+    # record's bytes rather than through an intermediate str.
+    return _UPPER_LUT[np.frombuffer(seq_bytes, np.uint8)]
+
+
+def find_pam_sites(arr):
+    # Start positions of every 20-mer followed by an NGG PAM, found with one
+    # vectorised byte comparison instead of slicing each 3-mer in Python.
+    n = len(arr) - (GUIDE_LEN + 3)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Both G positions of the PAM come from one comparison pass, offset by one
+    is_g = arr[GUIDE_LEN + 1:] == ord("G")
+    return np.flatnonzero(is_g[:n] & is_g[1:n + 1])
+
+
+def extract_windows(arr, starts, width):
+    # (len(starts), width) byte matrix of the windows beginning at each start.
+    # Rows are gathered from a fixed-width strided view of the buffer, which
+    # avoids materialising an (N, width) index matrix.
+    if not len(starts):
+        # Records shorter than the window have no view to take
+        return np.empty((0, width), dtype=arr.dtype)
+    return sliding_window_view(arr, width)[starts]
+
+
+def matrix_to_strings(matrix):
+    return matrix.view(f"S{matrix.shape[1]}").ravel().astype(str)
+
+
+def pam_column(first_bases):
+    # Every PAM is <N>GG, so only its first base is carried per guide and
+    # the column is rebuilt as a categorical of the few distinct PAMs.
+    bases, codes = np.unique(first_bases, return_inverse=True)
+    return pd.Categorical.from_codes(codes, categories=[chr(base) + "GG" for base in bases])
+
+
+def encode_guides(matrix):
+    # GC %, molecular weight and per-base codes of a (N, 20) byte matrix,
+    # computed through lookup tables and written into a C-contiguous
+    # float32 block, which XGBoost consumes without any further conversion.
+    features = np.empty((len(matrix), 2 + GUIDE_LEN), dtype=np.float32, order="C")
+    features[:, 0] = _GC_LUT[matrix].sum(axis=1) * (100.0 / GUIDE_LEN)
+    features[:, 1] = _WEIGHT_LUT[matrix].sum(axis=1)
+    features[:, 2:] = _CODE_LUT[matrix]
+
+    return features
+
+
+def pack_guides(matrix):
+    # One uint64 per guide, 2 bits per base. The word is an exact key for
+    # the 20-mer; guides with non-ACGT bases get _UNPACKABLE.
+    codes = _PACK_LUT[matrix]
+    words = np.zeros(len(matrix), dtype=np.uint64)
+    for j in range(GUIDE_LEN):
+        words = (words << np.uint64(2)) | (codes[:, j] & 3)
+    words[(codes > 3).any(axis=1)] = _UNPACKABLE
+    return words
+
+
+def unique_guides(keys):
+    # Maps every guide onto one representative per distinct 20-mer:
+    # returns (representative indices, inverse) like np.unique. Unpackable
+    # guides are kept distinct by giving each its own out-of-range key.
+    keys = keys.copy()
+    unpackable = np.flatnonzero(keys == _UNPACKABLE)
+    keys[unpackable] = np.uint64(1 << 63) | unpackable.astype(np.uint64)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse
+
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _encode_kernel(buf, starts, code_lut, weight_lut, gc_lut, pack_lut, out, keys):
+        # One pass per guide straight off the record buffer: GC count,
+        # molecular weight, base codes and the 2-bit packed key, instead of
+        # a separate lookup-table gather over the guide matrix for each.
+        # GUIDE_LEN is a module constant, so Numba compiles the inner loop
+        # with a fixed trip count of 20.
+        for n in range(starts.shape[0]):
+            start = starts[n]
+            gc = 0
+            mw = 0.0
+            key = np.uint64(0)
+            packable = True
+            for j in range(GUIDE_LEN):
+                base = buf[start + j]
+                gc += gc_lut[base]
+                mw += weight_lut[base]
+                out[n, 2 + j] = code_lut[base]
+                bits = pack_lut[base]
+                packable &= bits < 4
+                key = (key << np.uint64(2)) | np.uint64(bits & 3)
+            out[n, 0] = gc * (100.0 / GUIDE_LEN)
+            out[n, 1] = mw
+            keys[n] = key if packable else _UNPACKABLE
+
+
+
+def warm_up_encoder():
+    # Compiles (or loads from Numba's cache) the kernel ahead of the first
+    # upload; called when the Celery worker starts, never on import
+    encode_guides_at(np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.intp))
+
+
+def encode_guides_at(arr, starts, guides=None):
+    # Features and packed keys of the guides beginning at each start of
+    # one record buffer. The NumPy fallback works on the guide matrix, so
+    # callers that already extracted it pass it in.
+    if not _NUMBA_AVAILABLE:
+        if guides is None:
+            guides = extract_windows(arr, starts, GUIDE_LEN)
+        return encode_guides(guides), pack_guides(guides)
+
+    features = np.empty((len(starts), 2 + GUIDE_LEN), dtype=np.float32)
+    keys = np.empty(len(starts), dtype=np.uint64)
+    _encode_kernel(arr, starts, _CODE_LUT, _WEIGHT_LUT, _GC_LUT, _PACK_LUT, features, keys)
+    return features, keys
+
+
+def select_top(scores, gc, k):
+    # Indices of the k best guides scoring above 0.8 with 40-60% GC, best
+    # first. argpartition picks them in O(N) instead of sorting everything.
+    idx = np.flatnonzero((scores > 0.8) & (gc >= 40) & (gc <= 60))
+    if len(idx) > k:
+        idx = idx[np.argpartition(scores[idx], -k)[-k:]]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+# ============================================================
+# RECORD SCANNING
+# ============================================================
+
+# One pool per worker process. The Celery worker runs jobs as threads
+# (see Procfile), so concurrent jobs share these processes rather than
+# each starting a pool of its own.
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_POOL_WORKERS = os.cpu_count() or 1
+
+
+def _scan_record(record):
+    # Runs in a pool worker: PAM hits of one record with their guide window,
+    # PAM first base, encoded features and packed key.
+    rec_id, seq_bytes = record
+    arr = sequence_bytes(seq_bytes)
+    hits = find_pam_sites(arr)
+    guides = extract_windows(arr, hits, GUIDE_LEN)
+    features, keys = encode_guides_at(arr, hits, guides)
+    return rec_id, hits.astype(np.int32), guides, arr[hits + GUIDE_LEN], features, keys
+
+
+def _get_pool():
+    # Created on first use so that importing this module never starts
+    # processes. Daemonic processes (prefork children) may not have any.
+    # Workers come from a forkserver, as forking a threaded worker could
+    # copy locks held by other job threads.
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None and _POOL_WORKERS > 1 and not multiprocessing.current_process().daemon:
+            _POOL = ProcessPoolExecutor(
+                max_workers=_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        return _POOL
+
+
+def _discard_pool(pool):
+    # A pool with a dead worker stays broken, so the next job gets a new one
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_records(records):
+    # Scans (id, bytes) records in parallel, yielding results in input order.
+    # At most two records per worker are in flight, so a streamed FASTA is
+    # never fully buffered.
+    pool = _get_pool()
+    if pool is None:
+        yield from map(_scan_record, records)
+        return
+
+    pending = deque()
+    try:
+        for record in records:
+            pending.append(pool.submit(_scan_record, record))
+            if len(pending) >= 2 * _POOL_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    except BrokenProcessPool:
+        # A worker died mid-job, e.g. killed for memory on a large genome
+        _discard_pool(pool)
+        raise
+
+# ============================================================
+# REPORTS
+# ============================================================
+
+def _purge_old_reports():
+    cutoff = time.time() - REPORT_TTL_SECONDS
+    try:
+        _, names = default_storage.listdir(REPORTS_DIR)
+    except FileNotFoundError:
+        # No report saved yet
+        return
+
+    for name in names:
+        report = f"{REPORTS_DIR}/{name}"
+        try:
+            if default_storage.get_modified_time(report).timestamp() < cutoff:
+                default_storage.delete(report)
+        except FileNotFoundError:
+            # Already removed by another worker
+            pass
+
+
+def save_report(df):
+    # Reports live in the default storage and only their name goes into
+    # the session, so the session backend never has to carry the CSV
+    # itself and the web process can read what the worker wrote.
+    _purge_old_reports()
+
+    # Stored gzipped: the CSV shrinks several times over and can be sent as is
+    with tempfile.TemporaryFile() as report:
+        df.to_csv(report, index=False, compression={"method": "gzip", "compresslevel": 6})
+        report.seek(0)
+        return default_storage.save(f"{REPORTS_DIR}/{uuid.uuid4().hex}.csv.gz", File(report))
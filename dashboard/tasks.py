@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import io
+import os
+import threading
+
+import joblib
+import xgboost as xgb
+from celery import shared_task
+from celery.signals import worker_init
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from Bio import SeqIO
+
+from .charts import cache_charts
+from .pipeline import (
+    matrix_to_strings,
+    pam_column,
+    save_report,
+    scan_records,
+    select_top,
+    unique_guides,
+    warm_up_encoder,
+)
+
+# ============================================================
+# MODEL
+# ============================================================
+
+MODEL_PATH = os.path.join(settings.BASE_DIR, "genome_x_xgboost.model")
+
+_BOOSTER = None
+_BOOSTER_LOCK = threading.Lock()
+
+
+def get_booster():
+    # Loaded once per worker process on first use, so web processes that
+    # import this module to enqueue jobs never unpickle the model.
+    # Inference on it is read-only.
+    global _BOOSTER
+    with _BOOSTER_LOCK:
+        if _BOOSTER is None and os.path.exists(MODEL_PATH):
+            _BOOSTER = joblib.load(MODEL_PATH).get_booster()
+            # Worker jobs share one process (threads pool), and the DMatrix
+            # nthread only covers its construction, so prediction is given
+            # every core explicitly.
+            _BOOSTER.set_param({"nthread": os.cpu_count() or 1})
+        return _BOOSTER
+
+
+@worker_init.connect
+def _prepare_worker(**kwargs):
+    # The worker pays for the model and the encoder kernel once at startup
+    get_booster()
+    warm_up_encoder()
+
+# ============================================================
+# TASKS
+# ============================================================
+
+@shared_task
+def run_pipeline(upload, digest):
+    # The upload is a name in the default storage, which the web process
+    # and this worker must share (see settings_prod)
+    if not default_storage.exists(upload):
+        return {"error": "Uploaded file is not visible to the analysis worker; check the shared media storage."}
+
+    record_ids = {}
+    record_codes, positions, guides, pam_bases, features, keys = [], [], [], [], [], []
+
+    # Records are scanned as they are parsed, one per pool worker; only
+    # typed per-column buffers are kept until the DataFrame is built.
+    # Read through a text wrapper: iterating a storage File directly
+    # restarts from the top on every pass
+    with io.TextIOWrapper(default_storage.open(upload, "rb")) as handle:
+        records = ((rec.id, bytes(rec.seq)) for rec in SeqIO.parse(handle, "fasta"))
+        for rec_id, hits, rec_guides, rec_pam_bases, rec_features, rec_keys in scan_records(records):
+            code = record_ids.setdefault(rec_id, len(record_ids))
+            record_codes.append(np.full(len(hits), code, dtype=np.int32))
+            positions.append(hits)
+            guides.append(rec_guides)
+            pam_bases.append(rec_pam_bases)
+            features.append(rec_features)
+            keys.append(rec_keys)
+
+    if not sum(len(hits) for hits in positions):
+        return {"error": "No CRISPR targets (NGG) found."}
+
+    booster = get_booster()
+    if booster is None:
+        return {"error": "ML model file missing on server."}
+
+    # Candidate table from the per-record buffers
+    matrix = np.concatenate(guides)
+    df = pd.DataFrame({
+        "id": pd.Categorical.from_codes(np.concatenate(record_codes), categories=list(record_ids)),
+        "pos": np.concatenate(positions),
+        "seq": matrix_to_strings(matrix),
+        "pam": pam_column(np.concatenate(pam_bases))
+    })
+    X_input = np.concatenate(features)
+
+    # Features depend only on the 20-mer, so each distinct guide is scored
+    # once, in one batched prediction spread across all cores
+    first, inverse = unique_guides(np.concatenate(keys))
+    dmat = xgb.DMatrix(X_input[first], feature_names=booster.feature_names, nthread=-1)
+    scores = booster.predict(dmat)[inverse]
+    df["Predicted_Efficiency"] = scores
+
+    gc = X_input[:, 0]
+    df["GC_Content"] = gc
+
+    # Only the report needs every candidate in order
+    order = np.argsort(-scores, kind="stable")
+    results_report = save_report(df.iloc[order])
+
+    # Charts are drawn here from the arrays already in memory, in report order
+    cache_charts(digest, {
+        "Predicted_Efficiency": scores[order],
+        "GC_Content": gc[order],
+        "seq": matrix
+    })
+
+    # Only the top 20 qualified rows reach the dashboard, so only they are rounded
+    top = df.iloc[select_top(scores, gc, 20)]
+    top = top.astype({"Predicted_Efficiency": float, "GC_Content": float})
+    top_candidates = top.round({"Predicted_Efficiency": 4, "GC_Content": 1}).to_dict("records")
+
+    return {
+        "results_report": results_report,
+        "results_digest": digest,
+        "candidates": top_candidates,
+        "total": len(df),
+        "qualified": len(top_candidates)
+    }
@@ -1,3 +1,171 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import pipeline
+
+# Two records with a handful of NGG sites between them, one lowercase
+FASTA = (
+    b">rec1\n"
+    b"ATGCGTACGTTAGCCGATCGATGGCATGCAGTCGATCGTAGCTAGCTAGGCTAGCATCGATCGAGG\n"
+    b">rec2\n"
+    b"ttagcgatcgatcgtagctagctagcatcgacgatcgggatcgatcgatagctagcatgcatcgtgg\n"
+)
+
+
+def baseline_pam_sites(seq):
+    # The original per-position scan the vectorised search replaced
+    seq = seq.upper()
+    return [i for i in range(len(seq) - 23) if seq[i + 20:i + 23].endswith("GG")]
+
+
+def baseline_features(seq):
+    # The original scalar encoder: GC %, molecular weight, base codes
+    gc = (seq.count("G") + seq.count("C")) / len(seq) * 100
+    mw = sum(pipeline.BASE_WEIGHTS.get(base, 0) for base in seq)
+    return [gc, mw] + [pipeline.BASE_CODES.get(base, 0) for base in seq]
+
+
+def random_sequence(rng, length, alphabet="ACGT"):
+    return "".join(rng.choice(list(alphabet), length))
+
+
+class PamSitesTest(SimpleTestCase):
+
+    def sites(self, seq):
+        return pipeline.find_pam_sites(pipeline.sequence_bytes(seq.encode("ascii"))).tolist()
+
+    def test_matches_baseline_scan(self):
+        rng = np.random.default_rng(0)
+        for length in (0, 1, 22, 23, 24, 25, 26, 200):
+            for alphabet in ("ACGT", "acgtn", "ACGTNGG"):
+                seq = random_sequence(rng, length, alphabet)
+                self.assertEqual(self.sites(seq), baseline_pam_sites(seq), seq)
+
+    def test_short_records(self):
+        # The baseline loop never looks at the last possible window
+        self.assertEqual(self.sites("A" * 20 + "AGG"), [])
+        self.assertEqual(self.sites("A" * 20 + "AGGT"), [0])
+        self.assertEqual(self.sites("a" * 20 + "nggt"), [0])
+
+
+class GuideEncodingTest(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        seq = random_sequence(rng, 2000, "ACGTN") + "A" * 20 + "AGG"
+        self.arr = pipeline.sequence_bytes(seq.encode("ascii"))
+        self.starts = np.arange(len(self.arr) - pipeline.GUIDE_LEN + 1)
+        self.matrix = pipeline.extract_windows(self.arr, self.starts, pipeline.GUIDE_LEN)
+
+    def test_matches_scalar_encoder(self):
+        expected = [baseline_features(guide) for guide in pipeline.matrix_to_strings(self.matrix)]
+        np.testing.assert_allclose(pipeline.encode_guides(self.matrix), expected, rtol=1e-6)
+
+    @skipUnless(pipeline._NUMBA_AVAILABLE, "numba is not installed")
+    def test_kernel_matches_fallback(self):
+        features, keys = pipeline.encode_guides_at(self.arr, self.starts)
+        np.testing.assert_allclose(features, pipeline.encode_guides(self.matrix), rtol=1e-6)
+        np.testing.assert_array_equal(keys, pipeline.pack_guides(self.matrix))
+
+    def test_packing(self):
+        keys = pipeline.pack_guides(self.matrix)
+        has_n = (self.matrix == ord("N")).any(axis=1)
+        self.assertTrue(has_n.any())
+        self.assertTrue((keys[has_n] == pipeline._UNPACKABLE).all())
+        self.assertTrue((keys[~has_n] < 1 << 40).all())
+
+        # Keys are exact: equal keys only for equal 20-mers
+        guides = pipeline.matrix_to_strings(self.matrix[~has_n])
+        self.assertEqual(len(set(keys[~has_n].tolist())), len(set(guides)))
+
+
+class UniqueGuidesTest(SimpleTestCase):
+
+    def test_representatives(self):
+        guides = ["ACGT" * 5, "N" * 20, "TTGCA" * 4, "ACGT" * 5, "N" * 20, "ACGN" * 5]
+        matrix = np.frombuffer("".join(guides).encode("ascii"), np.uint8).reshape(-1, pipeline.GUIDE_LEN)
+        first, inverse = pipeline.unique_guides(pipeline.pack_guides(matrix))
+
+        # Every guide maps to a representative with the same 20-mer
+        self.assertEqual([guides[i] for i in first[inverse]], guides)
+        # Repeated packable guides share one; unpackable ones never do
+        self.assertEqual(first[inverse][3], 0)
+        self.assertEqual(sorted(first[inverse][[1, 4, 5]]), [1, 4, 5])
+        self.assertEqual(len(first), 5)
+
+
+class SelectTopTest(SimpleTestCase):
+
+    def test_thresholds_and_order(self):
+        scores = np.array([0.95, 0.81, 0.8, 0.99, 0.9, 0.85, 0.95, 0.7], dtype=np.float32)
+        gc = np.array([50, 40, 50, 61, 60, 39.9, 45, 50])
+        self.assertEqual(pipeline.select_top(scores, gc, 10).tolist(), [0, 6, 4, 1])
+        # Equal scores keep their input order
+        self.assertEqual(pipeline.select_top(scores, gc, 2).tolist(), [0, 6])
+        self.assertEqual(pipeline.select_top(scores, gc, 3).tolist(), [0, 6, 4])
+
+    def test_matches_sorted_filter(self):
+        rng = np.random.default_rng(2)
+        scores = rng.random(5000).astype(np.float32)
+        gc = rng.integers(0, 21, 5000) * 5.0
+        qualified = np.flatnonzero((scores > 0.8) & (gc >= 40) & (gc <= 60))
+        expected = qualified[np.argsort(-scores[qualified], kind="stable")][:20]
+        self.assertEqual(pipeline.select_top(scores, gc, 20).tolist(), expected.tolist())
+
+
+class PipelineViewsTest(TestCase):
+    # Runs one upload end to end with the development settings, where the
+    # Celery task executes eagerly inside the request.
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        cache.clear()
+
+    def upload(self):
+        response = self.client.post("/", {"fasta_file": SimpleUploadedFile("scan.fasta", FASTA)})
+        self.assertEqual(response.status_code, 200)
+        return response.context["status_url"]
+
+    def test_upload_to_download(self):
+        status = self.client.get(self.upload()).json()
+        self.assertEqual(status["state"], "SUCCESS")
+
+        response = self.client.get(status["redirect"])
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.context["total"], 0)
+
+        for name in ("score_dist", "gc_scatter", "composition"):
+            response = self.client.get(f"/charts/{name}/")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("data", json.loads(response.content))
+        self.assertEqual(self.client.get("/charts/unknown/").status_code, 404)
+
+        response = self.client.get("/download/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        report = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertTrue(report.startswith("id,pos,seq,pam,Predicted_Efficiency,GC_Content"))
+
+        # gzip;q=0 refuses gzip, so the report is decompressed as it streams
+        response = self.client.get("/download/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(b"".join(response.streaming_content).decode(), report)
+
+    def test_other_session_job_is_hidden(self):
+        status_url = self.upload()
+        self.client.logout()
+        self.assertEqual(self.client.get(status_url).status_code, 404)
@@ -1,183 +1,68 @@
-import plotly.express as px
-import plotly.io as pio
-import pandas as pd
-import numpy as np
-import os
-
-import xgboost as xgb 
-from django.shortcuts import render
-from django.http import HttpResponse
-from django.core.files.storage import FileSystemStorage
-from django.conf import settings
-
-from Bio import SeqIO
+from plotly.offline import get_plotlyjs_version
+import gzip
+import hashlib
+
+from celery.result import AsyncResult
+from django.shortcuts import redirect, render
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header
+
+from .charts import CHART_BUILDERS, chart_key, report_chart
+from .tasks import run_pipeline
 
 # ============================================================
 # PATH CONFIG
 # ============================================================
 
-BASE_DIR = settings.BASE_DIR
-MODEL_PATH = os.path.join(BASE_DIR, "genome_x_xgboost.model")
-
-# ============================================================
-# BIOLOGY HELPERS
-# ============================================================
-
-def calculate_gc(seq):
-    return (seq.count("G") + seq.count("C")) / len(seq) * 100
-
-
-def get_molecular_weight(seq):
-    weights = {'A': 313.2, 'T': 304.2, 'G': 329.2, 'C': 289.2}
-    return sum(weights.get(base, 0) for base in seq)
-
-
-def encode_sequence(seq_list):
-    features = []
-    mapping = {'A': 1, 'T': 2, 'G': 3, 'C': 4}
+PLOTLY_JS_URL = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
 
-    for seq in seq_list:
-        gc = calculate_gc(seq)
-        mw = get_molecular_weight(seq)
-        num_seq = [mapping.get(base, 0) for base in seq]
-        features.append([gc, mw] + num_seq)
-
-    return features
+REPORT_FILENAME = "genome_x_report.csv"
 
 # ============================================================
-# INTERACTIVE CHARTS
+# VIEWS
 # ============================================================
 
-def generate_interactive_charts(df):
-    charts = {}
-
-    fig_dist = px.histogram(
-        df,
-        x="Predicted_Efficiency",
-        nbins=20,
-        title="AI Confidence Distribution",
-        template="plotly_dark"
-    )
-    fig_dist.update_layout(
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        font_color="white"
-    )
-    charts["score_dist"] = pio.to_html(fig_dist, full_html=False)
-
-    fig_scatter = px.scatter(
-        df,
-        x="GC_Content",
-        y="Predicted_Efficiency",
-        color="Predicted_Efficiency",
-        hover_data=["seq", "pam"],
-        title="GC Content vs Efficiency",
-        template="plotly_dark"
-    )
-    fig_scatter.add_vline(x=40, line_dash="dash", line_color="red")
-    fig_scatter.add_vline(x=60, line_dash="dash", line_color="red")
-    fig_scatter.update_layout(
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        font_color="white"
-    )
-    charts["gc_scatter"] = pio.to_html(fig_scatter, full_html=False)
-
-    counts = pd.DataFrame({
-        "Base": ["A", "T", "G", "C"],
-        "Count": [ "".join(df["seq"]).count(b) for b in "ATGC" ]
-    })
+def _accepts_gzip(accept_encoding):
+    # Parses the codings and q-values of an Accept-Encoding header: gzip
+    # must be listed (or matched by "*") with a non-zero q.
+    weights = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
 
-    fig_pie = px.pie(
-        counts,
-        values="Count",
-        names="Base",
-        title="Nucleotide Composition",
-        template="plotly_dark"
-    )
-    fig_pie.update_layout(
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        font_color="white"
-    )
-    charts["composition"] = pio.to_html(fig_pie, full_html=False)
-
-    return charts
-
-# ============================================================
-# VIEWS
-# ============================================================
 
 def home(request):
     if request.method == "POST" and request.FILES.get("fasta_file"):
         try:
-            # Ensure media directory exists
-            os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
-
+            # Saved through the default storage, which the worker reads from too
             uploaded_file = request.FILES["fasta_file"]
-            fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-            filename = fs.save(uploaded_file.name, uploaded_file)
-            file_path = fs.path(filename)
-
-            records = list(SeqIO.parse(file_path, "fasta"))
-            candidates = []
-
-            for rec in records:
-                seq = str(rec.seq).upper()
-                for i in range(len(seq) - 23):
-                    pam = seq[i + 20:i + 23]
-                    if pam.endswith("GG"):
-                        candidates.append({
-                            "id": rec.id,
-                            "pos": i,
-                            "seq": seq[i:i + 20],
-                            "pam": pam
-                        })
-
-            if not candidates:
-                return render(request, "index.html", {
-                    "error": "No CRISPR targets (NGG) found."
-                })
-
-            if not os.path.exists(MODEL_PATH):
-                return render(request, "index.html", {
-                    "error": "ML model file missing on server."
-                })
-
-            # ====================================================
-            # ✅ FIXED MODEL LOADING & PREDICTION (CRITICAL)
-            # ====================================================
-
-            df = pd.DataFrame(candidates)
-            X_input = encode_sequence(df["seq"])
-
-            booster = xgb.Booster()
-            booster.load_model(MODEL_PATH)
-
-            dmat = xgb.DMatrix(X_input)
-            df["Predicted_Efficiency"] = booster.predict(dmat)
-
-            df["GC_Content"] = df["seq"].apply(calculate_gc)
-            df = df.sort_values("Predicted_Efficiency", ascending=False)
-
-            request.session["results_csv"] = df.to_csv(index=False)
-
-            display_df = df.copy()
-            display_df["Predicted_Efficiency"] = display_df["Predicted_Efficiency"].round(4)
-            display_df["GC_Content"] = display_df["GC_Content"].round(1)
-
-            top_candidates = display_df[
-                (display_df["Predicted_Efficiency"] > 0.8) &
-                (display_df["GC_Content"].between(40, 60))
-            ].head(20).to_dict("records")
-
-            charts = generate_interactive_charts(df)
-
-            return render(request, "dashboard.html", {
-                "candidates": top_candidates,
-                "charts": charts,
-                "total": len(df),
-                "qualified": len(top_candidates)
+            filename = default_storage.save(uploaded_file.name, uploaded_file)
+
+            # Identical uploads give identical charts, so the digest keys the chart cache
+            digest = hashlib.blake2b()
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+
+            # The analysis runs on a Celery worker; the job page polls job_status
+            job = run_pipeline.delay(filename, digest.hexdigest())
+            request.session["job_id"] = job.id
+
+            return render(request, "job.html", {
+                "status_url": reverse("job_status", args=[job.id])
             })
 
         except Exception as e:
@@ -188,11 +73,90 @@ def home(request):
     return render(request, "index.html")
 
 
+def job_status(request, job_id):
+    if job_id != request.session.get("job_id"):
+        raise Http404("Unknown job.")
+
+    result = AsyncResult(job_id)
+    if result.failed():
+        return JsonResponse({"state": "FAILURE", "error": f"System Error: {result.result}"})
+    if not result.successful():
+        return JsonResponse({"state": result.state})
+
+    outcome = result.result
+    if "error" in outcome:
+        return JsonResponse({"state": "FAILURE", "error": outcome["error"]})
+
+    request.session["results_report"] = outcome["results_report"]
+    request.session["results_digest"] = outcome["results_digest"]
+    request.session["dashboard"] = {
+        "candidates": outcome["candidates"],
+        "total": outcome["total"],
+        "qualified": outcome["qualified"]
+    }
+    return JsonResponse({"state": "SUCCESS", "redirect": reverse("results")})
+
+
+def results(request):
+    context = request.session.get("dashboard")
+    if context is None:
+        return redirect("home")
+
+    return render(request, "dashboard.html", {
+        **context,
+        "plotly_js_url": PLOTLY_JS_URL
+    })
+
+
+def _decompressed(report):
+    # Plain CSV chunks of a stored report; closes it once fully sent
+    with report, gzip.GzipFile(fileobj=report) as csv:
+        yield from iter(lambda: csv.read(FileResponse.block_size), b"")
+
+
 def download_csv(request):
-    csv_data = request.session.get("results_csv")
-    if csv_data:
-        response = HttpResponse(csv_data, content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="genome_x_report.csv"'
-        return response
+    report_name = request.session.get("results_report")
+    if report_name:
+        try:
+            report = default_storage.open(report_name, "rb")
+        except FileNotFoundError:
+            # Report expired and was cleaned up
+            report = None
+
+        if report is not None:
+            # Reports are stored gzipped; send the bytes untouched when the
+            # client accepts gzip and decompress on the fly otherwise.
+            if _accepts_gzip(request.headers.get("Accept-Encoding", "")):
+                response = FileResponse(
+                    report,
+                    as_attachment=True,
+                    filename=REPORT_FILENAME,
+                    content_type="text/csv"
+                )
+                response["Content-Encoding"] = "gzip"
+            else:
+                # Streamed without a Content-Length: FileResponse would seek
+                # a GzipFile to its end, decompressing the whole report
+                # once just to size it
+                response = StreamingHttpResponse(_decompressed(report), content_type="text/csv")
+                response["Content-Disposition"] = content_disposition_header(True, REPORT_FILENAME)
+            patch_vary_headers(response, ["Accept-Encoding"])
+            return response
 
     return HttpResponse("No data available.")
+
+
+def chart_json(request, name):
+    report_name = request.session.get("results_report")
+    digest = request.session.get("results_digest")
+    if name not in CHART_BUILDERS or not digest or not report_name:
+        raise Http404("Chart not available.")
+
+    # run_pipeline caches every chart; the report is only read back on a miss
+    chart = cache.get(chart_key(digest, name))
+    if chart is None:
+        if not default_storage.exists(report_name):
+            raise Http404("Chart not available.")
+        chart = report_chart(digest, report_name, name)
+
+    return HttpResponse(chart, content_type="application/json")
@@ -0,0 +1,11 @@
+import os
+from celery import Celery
+
+os.environ.setdefault(
+    'DJANGO_SETTINGS_MODULE',
+    'genome_x_web.settings_prod'
+)
+
+app = Celery('genome_x_web')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,3 +1,5 @@
+import os
+
 from .settings import *
 
 DEBUG = False
@@ -10,4 +12,24 @@ MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",
 ] + MIDDLEWARE
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "media"
+# Uploads and reports go through the default storage: the web process saves
+# the FASTA and serves the report, the worker reads one and writes the
+# other. When web and worker run on separate machines (separate Procfile
+# dynos), MEDIA_ROOT must be a shared volume or STORAGES["default"] must
+# point at a shared backend such as S3; the task reports a missing upload.
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# Background analysis jobs
+CELERY_BROKER_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+CELERY_TASK_ALWAYS_EAGER = False
+CELERY_RESULT_EXPIRES = 24 * 60 * 60
+
+# Share the chart cache between workers when Redis is available
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
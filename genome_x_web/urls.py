@@ -8,7 +8,10 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
+    path('status/<str:job_id>/', views.job_status, name='job_status'),
+    path('results/', views.results, name='results'),
     path('download/', views.download_csv, name='download_csv'),
+    path('charts/<str:name>/', views.chart_json, name='chart_json'),
 ]
 
 # IMPORTANT: enable media handling (for file uploads)